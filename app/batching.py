@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import Executor
+from contextlib import suppress
+from typing import Callable, List, Optional, Set, Tuple
+
+BatchHandler = Callable[[List[str]], List[Tuple[int, float]]]
+
+
+class DynamicBatcher:
+    """Собирает параллельные запросы на классификацию в общий батч для одного прохода модели."""
+
+    def __init__(
+            self,
+            handler: BatchHandler,
+            max_batch_size: int = 16,
+            max_wait_ms: float = 10.0,
+            executor: Optional[Executor] = None,
+            max_concurrent_batches: int = 1,
+    ) -> None:
+        """
+        Инициализация батчера.
+
+        Args:
+            handler: Функция, классифицирующая список текстов за один проход
+            max_batch_size: Максимальный размер батча
+            max_wait_ms: Сколько ждать новых запросов после первого в батче, мс
+            executor: Пул, в котором выполняется handler (по умолчанию пул потоков цикла событий)
+            max_concurrent_batches: Сколько батчей может обрабатываться одновременно
+        """
+        self._handler = handler
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._executor = executor
+        self._max_concurrent_batches = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Запустить фоновую задачу обработки очереди."""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self._max_concurrent_batches)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу."""
+        if self._worker is None:
+            return
+        tasks = [self._worker, *self._dispatches]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._worker = None
+
+    async def submit(self, text: str) -> Tuple[int, float]:
+        """
+        Поставить текст в очередь и дождаться результата классификации.
+
+        Args:
+            text: Предобработанный текст
+
+        Returns:
+            Кортеж (индекс класса, вероятность)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Дождаться первого запроса и добрать к нему накопившиеся за max_wait_ms."""
+        batch = [await self._queue.get()]
+        if self._queue.qsize() < self._max_batch_size - 1:
+            await asyncio.sleep(self._max_wait)
+        while len(batch) < self._max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        """Цикл сбора батчей: пока все обработчики заняты, запросы продолжают копиться в очереди."""
+        while True:
+            await self._slots.acquire()
+            batch = [item for item in await self._collect() if not item[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Один проход модели по батчу и раздача результатов."""
+        loop = asyncio.get_running_loop()
+        texts = [text for text, _ in batch]
+        try:
+            results = await loop.run_in_executor(self._executor, self._handler, texts)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,48 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Ограниченный LRU-кэш со счётчиком попаданий."""
+
+    def __init__(self, max_size: int, name: str = "cache", log_every: int = 1000) -> None:
+        """
+        Инициализация кэша.
+
+        Args:
+            max_size: Максимальное число элементов (0 - кэш отключён)
+            name: Имя кэша в логах
+            log_every: Через сколько обращений логировать долю попаданий
+        """
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._max_size = max_size
+        self._name = name
+        self._log_every = log_every
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получить значение (с обновлением порядка LRU) или None."""
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self._items.move_to_end(key)
+            self.hits += 1
+
+        lookups = self.hits + self.misses
+        if lookups % self._log_every == 0:
+            logger.info("%s: %.1f%% попаданий из %d обращений", self._name, 100 * self.hits / lookups, lookups)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение, вытесняя самое давно использованное."""
+        if not self._max_size:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._max_size:
+            self._items.popitem(last=False)
@@ -1,7 +1,18 @@
-from typing import Tuple
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+except ImportError:
+    ort = None
 
 EMOTION_RU = {
     "admiration": "восхищение",
@@ -36,25 +47,202 @@ EMOTION_RU = {
 
 MODEL_NAME = "seara/rubert-base-cased-russian-emotion-detection-ru-go-emotions"
 
+# Каталог для экспортированной и квантованной ONNX-модели
+ONNX_DIR = Path(".onnx")
+
+# Число потоков для инференса на CPU
+NUM_THREADS = max(1, (os.cpu_count() or 1) // 2)
+torch.set_num_threads(NUM_THREADS)
+
+# Максимальная длина входа в токенах (сообщения чатов заметно короче)
+MAX_LENGTH = 128
+
+# Ширина корзины по длине в токенах при группировке батча
+BUCKET_WIDTH = 32
+
+
+def uses_onnx(use_onnx: bool = True) -> bool:
+    """Будет ли модель выполняться через ONNX Runtime (только на CPU и при установленном onnxruntime)."""
+    return use_onnx and ort is not None and not torch.cuda.is_available()
+
+
+def export_onnx_model(model_name: str = MODEL_NAME, onnx_dir: Path = ONNX_DIR) -> Path:
+    """
+    Экспортирует модель в ONNX с динамическим INT8-квантованием (AVX512-VNNI),
+    если это ещё не сделано.
+
+    Результат пишется во временный каталог и затем переименовывается целиком,
+    поэтому другие процессы никогда не видят недописанную модель.
+
+    Args:
+        model_name: Название модели из HuggingFace Hub
+        onnx_dir: Каталог для кэша квантованной модели
+
+    Returns:
+        Путь к квантованной модели
+    """
+    save_dir = Path(onnx_dir) / model_name.replace("/", "__")
+    model_path = save_dir / "model_quantized.onnx"
+    if model_path.exists():
+        return model_path
+
+    save_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=save_dir.name + ".", dir=save_dir.parent))
+    try:
+        ort_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        quantizer = ORTQuantizer.from_pretrained(ort_model)
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=tmp_dir, quantization_config=qconfig)
+        try:
+            os.replace(tmp_dir, save_dir)
+        except OSError:
+            # Другой процесс успел экспортировать модель раньше
+            if not model_path.exists():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model_path
+
+
+class EmotionLabels:
+    """Метки эмоций модели, заранее разложенные по индексу класса."""
+
+    __slots__ = ("_labels", "_labels_ru")
+
+    def __init__(self, id2label: Dict[int, str]) -> None:
+        """
+        Инициализация таблиц меток.
+
+        Args:
+            id2label: Соответствие индекса класса и метки из конфигурации модели
+        """
+        self._labels = tuple(id2label[i] for i in range(len(id2label)))
+        self._labels_ru = tuple(EMOTION_RU.get(label, label) for label in self._labels)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str = MODEL_NAME) -> "EmotionLabels":
+        """Загружает метки из конфигурации модели, не загружая её веса."""
+        return cls(AutoConfig.from_pretrained(model_name).id2label)
+
+    def label(self, idx: int) -> str:
+        """Метка эмоции на английском по индексу класса."""
+        return self._labels[idx]
+
+    def label_ru(self, idx: int) -> str:
+        """Метка эмоции на русском по индексу класса (или исходная, если перевода нет)."""
+        return self._labels_ru[idx]
+
 
 class EmotionModelService:
     """Сервис для классификации эмоций в тексте используя трансформер модель."""
 
-    def __init__(self, model_name: str = MODEL_NAME) -> None:
+    def __init__(
+            self,
+            model_name: str = MODEL_NAME,
+            use_onnx: bool = True,
+            onnx_dir: Path = ONNX_DIR,
+            num_threads: int = NUM_THREADS,
+    ) -> None:
         """
         Инициализация сервиса.
 
+        При наличии CUDA модель PyTorch выполняется на GPU в FP16. На CPU, если
+        установлен onnxruntime, модель один раз экспортируется в ONNX, квантуется
+        в INT8 и выполняется через InferenceSession. Иначе используется модель
+        PyTorch с динамическим INT8-квантованием.
+
         Args:
             model_name: Название модели из HuggingFace Hub
+            use_onnx: Использовать ли ONNX Runtime, если он доступен
+            onnx_dir: Каталог для кэша квантованной ONNX-модели
+            num_threads: Число потоков для инференса
         """
         self._tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self._model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self._model = None
+        self._session = None
+        if uses_onnx(use_onnx):
+            self._session = self._build_onnx_session(model_name, Path(onnx_dir), num_threads)
+            self._session_inputs = {i.name for i in self._session.get_inputs()}
+            id2label = AutoConfig.from_pretrained(model_name).id2label
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_name, torchscript=True, attn_implementation="eager"
+            )
+            model.eval()
+            id2label = model.config.id2label
+            if self._device.type == "cuda":
+                model = model.to(self._device).half()
+            else:
+                # Динамическое INT8-квантование всех Linear-слоёв (ядра FBGEMM вместо FP32 sgemm)
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._model = self._trace(model)
+
+        self._labels = EmotionLabels(id2label)
+
+    def _trace(self, model: torch.nn.Module) -> torch.jit.ScriptModule:
+        """
+        Трассирует модель на примере входа, замораживает граф и оптимизирует его для инференса.
+
+        Замороженный граф выполняется без диспетчеризации Python на каждом слое;
+        optimize_for_inference дополнительно сворачивает константы и объединяет
+        операции, а на CPU включается слияние через oneDNN Graph.
+        Пример дополняется до фиксированной длины, чтобы в граф попала ветка
+        с маской внимания, корректная для любых входов.
+        """
+        if self._device.type == "cpu":
+            torch.jit.enable_onednn_fusion(True)
+        dummy = self._tokenizer("пример", return_tensors="pt", padding="max_length", max_length=64)
+        example = (dummy["input_ids"].to(self._device), dummy["attention_mask"].to(self._device))
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example, strict=False)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
 
     @staticmethod
-    def _softmax(logits: torch.Tensor) -> torch.Tensor:
-        """Численно стабильная реализация softmax."""
-        exps = torch.exp(logits - logits.max())
-        return exps / exps.sum(-1, keepdim=True)
+    def _build_onnx_session(model_name: str, onnx_dir: Path, num_threads: int) -> "ort.InferenceSession":
+        """
+        Открывает сессию ONNX Runtime для квантованной модели, при необходимости
+        сначала экспортируя её (см. export_onnx_model).
+
+        Args:
+            model_name: Название модели из HuggingFace Hub
+            onnx_dir: Каталог для кэша квантованной модели
+            num_threads: Число потоков для инференса
+
+        Returns:
+            Сессия ONNX Runtime
+        """
+        model_path = export_onnx_model(model_name, onnx_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        # Отключаем арену и шаблоны памяти, чтобы не держать лишнюю память между запросами
+        options.enable_cpu_mem_arena = False
+        options.enable_mem_pattern = False
+        return ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+
+    def _logits(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Прямой проход модели, возвращает логиты."""
+        if self._session is not None:
+            feed = {k: v.numpy() for k, v in inputs.items() if k in self._session_inputs}
+            return torch.from_numpy(self._session.run(None, feed)[0])
+        if self._device.type == "cuda":
+            # Асинхронное копирование из закреплённой памяти на GPU
+            inputs = {k: v.pin_memory().to(self._device, non_blocking=True) for k, v in inputs.items()}
+        with torch.inference_mode():
+            return self._model(inputs["input_ids"], inputs["attention_mask"])[0].float()
+
+    @staticmethod
+    def _top1(logits: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Наиболее вероятный класс и его вероятность для каждой строки логитов.
+
+        Полный softmax не нужен: argmax считается по логитам, а вероятность
+        победителя равна exp(logit - logsumexp(logits)).
+        """
+        idxs = torch.argmax(logits, dim=-1)
+        top = logits.gather(-1, idxs.unsqueeze(-1)).squeeze(-1)
+        return torch.exp(top - torch.logsumexp(logits, dim=-1)), idxs
 
     def classify(self, text: str) -> Tuple[str, float]:
         """
@@ -66,13 +254,42 @@ class EmotionModelService:
         Returns:
             Кортеж (метка эмоции, вероятность)
         """
-        inputs = self._tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            outputs = self._model(**inputs)
-        probs = self._softmax(outputs.logits)[0]
-        score, idx = torch.max(probs, dim=0)
-        label = self._model.config.id2label[int(idx)]
-        return label, float(score)
+        idx, score = self.classify_batch([text])[0]
+        return self._labels.label(idx), score
+
+    def classify_batch(self, texts: List[str]) -> List[Tuple[int, float]]:
+        """
+        Классифицирует эмоции для нескольких текстов.
+
+        Тексты группируются в корзины по длине в токенах (кратной BUCKET_WIDTH),
+        и каждая корзина обрабатывается отдельным проходом модели с дополнением
+        только до самого длинного текста в ней. Так короткие тексты не дополняются
+        до длины самого длинного текста во всём батче.
+
+        Args:
+            texts: Список входных текстов
+
+        Returns:
+            Список кортежей (индекс класса, вероятность) в порядке входных текстов;
+            метки по индексу дают EmotionLabels
+        """
+        encodings = self._tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+        buckets: Dict[int, List[int]] = {}
+        for i, ids in enumerate(encodings["input_ids"]):
+            buckets.setdefault(-(-len(ids) // BUCKET_WIDTH), []).append(i)
+
+        results: List[Optional[Tuple[int, float]]] = [None] * len(texts)
+        for positions in buckets.values():
+            bucket = {key: [values[i] for i in positions] for key, values in encodings.items()}
+            if len(positions) == 1:
+                # Одиночный текст дополнять не нужно
+                inputs = {key: torch.tensor(values) for key, values in bucket.items()}
+            else:
+                inputs = self._tokenizer.pad(bucket, padding="longest", return_tensors="pt")
+            scores, idxs = self._top1(self._logits(inputs))
+            for pos, score, idx in zip(positions, scores.tolist(), idxs.tolist()):
+                results[pos] = (idx, score)
+        return results
 
     @staticmethod
     def map_score_to_intensity(score: float) -> str:
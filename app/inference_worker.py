@@ -0,0 +1,59 @@
+import os
+from multiprocessing.synchronize import Barrier
+from typing import List, Optional, Tuple
+
+import torch
+
+from .emotion_model import EmotionModelService
+
+# Экземпляр модели, загруженный в процессе-обработчике
+_service: Optional[EmotionModelService] = None
+
+# Барьер, на котором прогретые процессы дожидаются друг друга (см. warmup)
+_ready: Optional[Barrier] = None
+
+
+def init_model(num_threads: int, ready: Barrier) -> None:
+    """
+    Инициализатор процесса-обработчика: загружает модель один раз на процесс.
+
+    Args:
+        num_threads: Число потоков для инференса в этом процессе
+        ready: Общий для всех процессов барьер прогрева
+    """
+    global _service, _ready
+    torch.set_num_threads(num_threads)
+    _service = EmotionModelService(num_threads=num_threads)
+    _ready = ready
+
+
+def warmup(timeout: float) -> int:
+    """
+    Прогревочный проход модели.
+
+    После прохода процесс ждёт на барьере остальных, поэтому при отправке
+    по одной задаче на процесс каждая задача достаётся отдельному процессу
+    и к возврату все процессы загрузили модель.
+
+    Args:
+        timeout: Сколько ждать остальные процессы, с
+
+    Returns:
+        PID процесса
+    """
+    _service.classify_batch(["пример"])
+    _ready.wait(timeout)
+    return os.getpid()
+
+
+def classify_batch(texts: List[str]) -> List[Tuple[int, float]]:
+    """
+    Классифицирует батч текстов моделью текущего процесса.
+
+    Args:
+        texts: Список предобработанных текстов
+
+    Returns:
+        Список кортежей (индекс класса, вероятность)
+    """
+    return _service.classify_batch(texts)
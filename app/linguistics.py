@@ -1,14 +1,25 @@
 import re
-from typing import Dict
+from typing import Dict, Optional
 
 
 class LinguisticAnalyzer:
     """Класс для лингвистического анализа текста и извлечения признаков."""
 
-    def extract_features(self, text: str) -> Dict[str, float]:
+    # Простой паттерн смайлика: ":)", ";-(", ":D" и т.п.
+    _EMOTICON_RE = re.compile(r"[:;]-?[()DP]")
+
+    # Все строки, которые описывает паттерн смайлика; используются для поиска
+    # смайликов общим автоматом вместе со словарями (см. ScenarioEngine.lexicon_hits)
+    EMOTICONS = frozenset(eyes + nose + mouth for eyes in ":;" for nose in ("", "-") for mouth in "()DP")
+
+    def extract_features(self, text: str, emoticons: Optional[int] = None) -> Dict[str, float]:
         """
         Извлекает лингвистические признаки из текста.
 
+        Args:
+            text: Текст для анализа
+            emoticons: Количество смайликов, если уже подсчитано
+
         Возвращает:
             Dict с признаками:
             - length: длина текста
@@ -21,13 +32,15 @@ class LinguisticAnalyzer:
         exclamations = text.count("!")
         questions = text.count("?")
 
-        # Доля заглавных букв (для детектирования CapsLock/крика)
-        caps = sum(1 for ch in text if ch.isalpha() and ch.isupper())
-        letters = sum(1 for ch in text if ch.isalpha())
-        caps_ratio = caps / letters if letters > 0 else 0.0
+        # Доля заглавных букв (для детектирования CapsLock/крика);
+        # filter/map выполняют проверки символов без интерпретируемого цикла
+        letters = "".join(filter(str.isalpha, text))
+        caps = sum(map(str.isupper, letters))
+        caps_ratio = caps / len(letters) if letters else 0.0
 
         # Количество смайликов по простому паттерну
-        emoticons = len(re.findall(r"[:;]-?[()DP]", text))
+        if emoticons is None:
+            emoticons = len(self._EMOTICON_RE.findall(text))
 
         return {
             "length": length,
@@ -1,24 +1,65 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
 
+import torch
 from fastapi import FastAPI, Form, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from .emotion_model import EmotionModelService
+from . import inference_worker
+from .batching import DynamicBatcher
+from .cache import LRUCache
+from .emotion_model import EmotionLabels, EmotionModelService, export_onnx_model, uses_onnx
 from .linguistics import LinguisticAnalyzer
 from .models import (
     AnalyzeResponse,
     EmotionResult,
-    HistoryItem,
     HistoryRepository,
     ScenarioResult,
 )
 from .preprocessing import TextPreprocessor
 from .scenarios import ScenarioEngine
 
-app = FastAPI(title="Система анализа эмоций")
+# Uvicorn настраивает только свои логгеры, поэтому логи приложения
+# (например, доля попаданий в кэш) выводим отдельным обработчиком
+app_logger = logging.getLogger(__package__)
+app_logger.setLevel(logging.INFO)
+if not app_logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(levelname)s:     %(name)s - %(message)s"))
+    app_logger.addHandler(_log_handler)
+    app_logger.propagate = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Запуск и остановка фонового батчера и процессов-обработчиков модели."""
+    # Экспорт ONNX-модели выполняется один раз здесь, а не параллельно в каждом процессе
+    if uses_onnx():
+        export_onnx_model()
+
+    # Загрузка модели во все процессы до первых запросов; ошибка инициализации
+    # обнаруживается при старте, а не на запросах пользователей
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(inference_executor, inference_worker.warmup, WARMUP_TIMEOUT)
+        for _ in range(INFERENCE_WORKERS)
+    ))
+
+    await emotion_batcher.start()
+    yield
+    await emotion_batcher.stop()
+    inference_executor.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="Система анализа эмоций", lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
@@ -95,7 +136,9 @@ class EmotionAnalysisService:
             self,
             preprocessor: TextPreprocessor,
             linguistics: LinguisticAnalyzer,
-            emotion_model: EmotionModelService,
+            batcher: DynamicBatcher,
+            classification_cache: LRUCache,
+            labels: EmotionLabels,
             scenarios: ScenarioEngine,
     ) -> None:
         """
@@ -104,15 +147,19 @@ class EmotionAnalysisService:
         Args:
             preprocessor: Сервис предобработки текста
             linguistics: Сервис лингвистического анализа
-            emotion_model: Сервис классификации эмоций
+            batcher: Батчер запросов к модели классификации
+            classification_cache: Кэш результатов классификации по предобработанному тексту
+            labels: Метки эмоций по индексу класса модели
             scenarios: Сервис обработки сценариев
         """
         self._preprocessor = preprocessor
         self._linguistics = linguistics
-        self._emotion_model = emotion_model
+        self._batcher = batcher
+        self._classification_cache = classification_cache
+        self._labels = labels
         self._scenarios = scenarios
 
-    def analyze_text(self, raw_text: str) -> Tuple[AnalyzeResponse, dict, str]:
+    async def analyze_text(self, raw_text: str) -> Tuple[AnalyzeResponse, dict, str]:
         """
         Полный анализ текста от предобработки до генерации сценариев.
 
@@ -125,19 +172,30 @@ class EmotionAnalysisService:
         # Предобработка
         cleaned = self._preprocessor.preprocess(raw_text)
 
-        # Лингвистический анализ
-        features = self._linguistics.extract_features(cleaned)
-
-        # Классификация эмоций
-        label, score = self._emotion_model.classify(cleaned)
-        label_ru = self._emotion_model.to_ru(label)
-        intensity = self._emotion_model.map_score_to_intensity(score)
+        # Один проход автомата по тексту: словари сценариев и смайлики
+        hits = self._scenarios.lexicon_hits(cleaned)
 
-        # Анализ полярности
-        shares = self._scenarios.polarity_with_lexicon(label, cleaned)
+        # Лингвистический анализ
+        features = self._linguistics.extract_features(cleaned, emoticons=hits["emoticon"])
+
+        # Классификация эмоций: повторы берутся из кэша и не попадают в очередь,
+        # остальные объединяются с параллельными запросами в один батч
+        result = self._classification_cache.get(cleaned)
+        if result is None:
+            result = await self._batcher.submit(cleaned)
+            self._classification_cache.put(cleaned, result)
+        idx, score = result
+        label = self._labels.label(idx)
+        label_ru = self._labels.label_ru(idx)
+        intensity = EmotionModelService.map_score_to_intensity(score)
+
+        # Анализ полярности (текст уже в нижнем регистре)
+        shares = self._scenarios.polarity_with_lexicon(label, cleaned, hits=hits)
 
         # Генерация сценариев
-        scenario_dict = self._scenarios.build_scenarios_single(label, intensity, cleaned)
+        scenario_dict = self._scenarios.build_scenarios_single(
+            label, intensity, cleaned, polarity=shares, hits=hits
+        )
 
         emotion_result = EmotionResult(label=label_ru, score=score, intensity=intensity)
         scenario_result = ScenarioResult(
@@ -161,12 +219,38 @@ class EmotionAnalysisService:
 auth_service = AuthService()
 preprocessor = TextPreprocessor()
 linguistics = LinguisticAnalyzer()
-emotion_model_service = EmotionModelService()
+
+# Модель работает в отдельных процессах, чтобы инференс не блокировал цикл событий и GIL;
+# при наличии GPU достаточно одного процесса, чтобы не держать на нём несколько копий модели
+INFERENCE_WORKERS = 1 if torch.cuda.is_available() else max(1, (os.cpu_count() or 1) // 2)
+# Сколько прогретый процесс ждёт загрузки модели в остальных, с
+WARMUP_TIMEOUT = 600
+inference_context = multiprocessing.get_context("spawn")
+inference_executor = ProcessPoolExecutor(
+    max_workers=INFERENCE_WORKERS,
+    mp_context=inference_context,
+    initializer=inference_worker.init_model,
+    initargs=(
+        max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS),
+        inference_context.Barrier(INFERENCE_WORKERS),
+    ),
+)
+emotion_batcher = DynamicBatcher(
+    inference_worker.classify_batch,
+    max_batch_size=16,
+    max_wait_ms=10,
+    executor=inference_executor,
+    max_concurrent_batches=INFERENCE_WORKERS,
+)
+classification_cache = LRUCache(max_size=4096, name="Кэш классификации")
+
 scenario_engine = ScenarioEngine()
 analysis_service = EmotionAnalysisService(
     preprocessor=preprocessor,
     linguistics=linguistics,
-    emotion_model=emotion_model_service,
+    batcher=emotion_batcher,
+    classification_cache=classification_cache,
+    labels=EmotionLabels.from_pretrained(),
     scenarios=scenario_engine,
 )
 history_repo = HistoryRepository(max_size=20)
@@ -238,19 +322,18 @@ async def analyze(request: Request, text: str = Form(...)) -> HTMLResponse:
         return RedirectResponse("/login")
 
     try:
-        analyze_response, shares, intensity = analysis_service.analyze_text(text)
+        analyze_response, shares, intensity = await analysis_service.analyze_text(text)
 
         # Добавление в историю
-        item = HistoryItem(
+        cleaned = analyze_response.cleaned_text
+        history_repo.add(
             timestamp=datetime.now(),
-            text_short=analyze_response.cleaned_text[:80]
-                       + ("..." if len(analyze_response.cleaned_text) > 80 else ""),
+            text_short=cleaned if len(cleaned) <= 80 else cleaned[:80] + "...",
             emotion_label=analyze_response.emotion.label,
             intensity=intensity,
             positive=shares["positive"],
             negative=shares["negative"],
         )
-        history_repo.add(item)
 
         return templates.TemplateResponse(
             "result.html",
@@ -1,5 +1,6 @@
+from collections import deque
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Deque, Dict, List, NamedTuple
 
 from pydantic import BaseModel
 
@@ -27,7 +28,9 @@ class AnalyzeResponse(BaseModel):
     scenarios: ScenarioResult
 
 
-class HistoryItem(BaseModel):
+class HistoryItem(NamedTuple):
+    """Строка истории анализов (лёгкий кортеж вместо pydantic-модели)."""
+
     timestamp: datetime
     text_short: str
     emotion_label: str
@@ -40,23 +43,39 @@ class HistoryRepository:
     """Репозиторий для управления историей анализов."""
 
     def __init__(self, max_size: int = 20):
-        self._items: List[HistoryItem] = []
-        self._max_size = max_size
-
-    def add(self, item: HistoryItem) -> None:
+        # Хранение по столбцам: отдельная очередь на каждое поле HistoryItem.
+        # Новые элементы в начале; deque сам отбрасывает самые старые сверх max_size
+        self._columns: Dict[str, Deque[Any]] = {
+            name: deque(maxlen=max_size) for name in HistoryItem._fields
+        }
+
+    def add(
+            self,
+            timestamp: datetime,
+            text_short: str,
+            emotion_label: str,
+            intensity: str,
+            positive: int,
+            negative: int,
+    ) -> None:
         """Добавить элемент в историю."""
-        self._items.insert(0, item)
-        if len(self._items) > self._max_size:
-            self._items.pop()
+        columns = self._columns
+        columns["timestamp"].appendleft(timestamp)
+        columns["text_short"].appendleft(text_short)
+        columns["emotion_label"].appendleft(emotion_label)
+        columns["intensity"].appendleft(intensity)
+        columns["positive"].appendleft(positive)
+        columns["negative"].appendleft(negative)
 
     def list(self) -> List[HistoryItem]:
         """Получить список всех элементов истории."""
-        return list(self._items)
+        return list(map(HistoryItem._make, zip(*self._columns.values())))
 
     def clear(self) -> None:
         """Очистить историю."""
-        self._items.clear()
+        for column in self._columns.values():
+            column.clear()
 
     def size(self) -> int:
         """Получить текущий размер истории."""
-        return len(self._items)
\ No newline at end of file
+        return len(self._columns["timestamp"])
\ No newline at end of file
@@ -1,4 +1,5 @@
-import re
+import unicodedata
+from functools import lru_cache
 
 
 class TextPreprocessor:
@@ -9,18 +10,24 @@ class TextPreprocessor:
         if not text:
             return ""
 
-        # Убираем лишние пробелы
-        text = text.strip()
-        # Нормализуем переносы строк и множественные пробелы
-        text = re.sub(r"\s+", " ", text)
-        return text
+        # Составные символы (й, ё и т.п.) приводим к единой форме, чтобы они
+        # не разрезались при обрезке текста и совпадали со словарями
+        text = unicodedata.normalize("NFC", text)
+        # Убираем пробелы по краям и схлопываем переносы строк и множественные
+        # пробелы за один проход split/join (те же пробельные символы, что и \s)
+        return " ".join(text.split())
 
     def to_lower(self, text: str) -> str:
         """Преобразование текста в нижний регистр."""
         return text.lower()
 
+    @lru_cache(maxsize=1024)
     def preprocess(self, raw_text: str) -> str:
-        """Конвейер предобработки: очистка -> нормализация -> приведение к нижнему регистру."""
+        """
+        Конвейер предобработки: очистка -> нормализация -> приведение к нижнему регистру.
+
+        Результат зависит только от входного текста, поэтому кэшируется.
+        """
         text = self.normalize_text(raw_text)
         text = self.to_lower(text)
         return text
\ No newline at end of file
@@ -1,112 +1,222 @@
-from typing import Dict
+from typing import Dict, Optional
+
+import ahocorasick
+
+from .linguistics import LinguisticAnalyzer
+
+# Словари ключевых слов и наборы меток эмоций (общие для всех экземпляров)
+_BAD_WORDS = frozenset({
+    "дурак",
+    "дура",
+    "идиот",
+    "идиотка",
+    "глупый",
+    "глупая",
+    "тупой",
+    "тупая",
+    "некомпетентный",
+    "бездарный",
+    "бездарная",
+    "бестолковый",
+    "бестолковая",
+    "плохой специалист",
+    "ужасный сервис",
+    "отвратительный сервис",
+})
+
+_NEGATIVE_TONE_WORDS = frozenset({
+    "грустно",
+    "печально",
+    "грусть",
+    "одиночество",
+    "одиноко",
+    "страшно",
+    "страх",
+    "ужасно",
+    "отвратительно",
+    "плохо",
+    "хуже",
+    "ужасный",
+    "отвратительный",
+    "устал",
+    "устала",
+    "утомил",
+    "утомила",
+    "надоел",
+    "надоела",
+    "надоели",
+    "раздражает",
+    "раздражение",
+    "осадок",
+    "неприятное чувство",
+    "разочарование",
+    "разочарован",
+    "разочарована",
+    "ненавижу",
+    "ненависть",
+    "боюсь",
+    "тревога",
+    "тревожно"
+})
+
+_POSITIVE_TONE_WORDS = frozenset({
+    "рад",
+    "рада",
+    "счастлив",
+    "счастлива",
+    "доволен",
+    "довольна",
+    "замечательный",
+    "замечательная",
+    "отличный",
+    "отличная",
+    "отлично",
+    "прекрасный",
+    "прекрасная",
+    "лучший",
+    "теплый день",
+    "хорошая погода",
+    "подарок",
+    "успех",
+    "повышение",
+    "похвала",
+    "благодарен",
+    "благодарна",
+    "люблю",
+    "нравится",
+    "спасибо",
+    "большое спасибо",
+    "огромное спасибо",
+    "выручили"
+})
+
+_POSITIVE_LABELS = frozenset({"joy", "admiration", "JOY", "HAPPINESS"})
+
+_NEGATIVE_LABELS = frozenset({
+    "anger",
+    "sadness",
+    "fear",
+    "disgust",
+    "annoyance",
+    "disappointment",
+    "grief",
+    "ANGER",
+    "SADNESS",
+    "FEAR",
+    "DISGUST"
+})
+
+# Метки эмоций для сценариев поддержки и модерации
+_NEGATIVE_EMOTIONS = frozenset({"anger", "sadness", "fear", "disgust", "annoyance",
+                                "disappointment", "grief", "remorse", "nervousness",
+                                "ANGER", "SADNESS", "FEAR", "DISGUST"})
+_POSITIVE_EMOTIONS = frozenset({"joy", "admiration", "JOY", "HAPPINESS", "gratitude", "love", "optimism"})
+_TOXIC_EMOTIONS = frozenset({"ANGER", "DISGUST", "IRRITATION", "ANGER/hostility", "anger"})
+
+# Интенсивности, при которых обращение считается важным
+_ELEVATED_INTENSITIES = frozenset({"средняя", "высокая"})
+
+
+def _votes_to_shares(pos_votes: int, neg_votes: int) -> Dict[str, int]:
+    """Переводит голоса за позитив/негатив в проценты."""
+    total_votes = pos_votes + neg_votes
+    if total_votes == 0:
+        return {"positive": 0, "negative": 0}
+
+    pos_share = int(round(pos_votes / total_votes * 100))
+    return {"positive": pos_share, "negative": 100 - pos_share}
 
 
 class ScenarioEngine:
     """Класс для обработки различных сценариев анализа текста и вычисления полярности."""
 
+    __slots__ = (
+        "bad_words",
+        "negative_tone_words",
+        "positive_tone_words",
+        "positive_labels",
+        "negative_labels",
+        "_label_votes",
+        "_lexicon",
+    )
+
     def __init__(self) -> None:
         """Инициализация словарей с ключевыми словами и метками эмоций."""
-        self.bad_words = {
-            "дурак",
-            "дура",
-            "идиот",
-            "идиотка",
-            "глупый",
-            "глупая",
-            "тупой",
-            "тупая",
-            "некомпетентный",
-            "бездарный",
-            "бездарная",
-            "бестолковый",
-            "бестолковая",
-            "плохой специалист",
-            "ужасный сервис",
-            "отвратительный сервис",
-        }
-
-        self.negative_tone_words = {
-            "грустно",
-            "печально",
-            "грусть",
-            "одиночество",
-            "одиноко",
-            "страшно",
-            "страх",
-            "ужасно",
-            "отвратительно",
-            "плохо",
-            "хуже",
-            "ужасный",
-            "отвратительный",
-            "устал",
-            "устала",
-            "утомил",
-            "утомила",
-            "надоел",
-            "надоела",
-            "надоели",
-            "раздражает",
-            "раздражение",
-            "осадок",
-            "неприятное чувство",
-            "разочарование",
-            "разочарован",
-            "разочарована",
-            "ненавижу",
-            "ненависть",
-            "боюсь",
-            "тревога",
-            "тревожно"
-        }
-
-        self.positive_tone_words = {
-            "рад",
-            "рада",
-            "счастлив",
-            "счастлива",
-            "доволен",
-            "довольна",
-            "замечательный",
-            "замечательная",
-            "отличный",
-            "отличная",
-            "отлично",
-            "прекрасный",
-            "прекрасная",
-            "лучший",
-            "теплый день",
-            "хорошая погода",
-            "подарок",
-            "успех",
-            "повышение",
-            "похвала",
-            "благодарен",
-            "благодарна",
-            "люблю",
-            "нравится",
-            "спасибо",
-            "большое спасибо",
-            "огромное спасибо",
-            "выручили"
-        }
-
-        self.positive_labels = {"joy", "admiration", "JOY", "HAPPINESS"}
-        self.negative_labels = {
-            "anger",
-            "sadness",
-            "fear",
-            "disgust",
-            "annoyance",
-            "disappointment",
-            "grief",
-            "ANGER",
-            "SADNESS",
-            "FEAR",
-            "DISGUST"
-        }
-
-    def support_scenario(self, emotion_label: str, intensity: str, text: str) -> str:
+        self.bad_words = _BAD_WORDS
+        self.negative_tone_words = _NEGATIVE_TONE_WORDS
+        self.positive_tone_words = _POSITIVE_TONE_WORDS
+        self.positive_labels = _POSITIVE_LABELS
+        self.negative_labels = _NEGATIVE_LABELS
+
+        # Голоса (позитив, негатив) за метку модели; позитивные метки имеют приоритет
+        self._label_votes = {label: (0, 3) for label in self.negative_labels}
+        self._label_votes.update({label: (3, 0) for label in self.positive_labels})
+
+        self._lexicon = self._build_lexicon_automaton()
+
+    def _build_lexicon_automaton(self) -> ahocorasick.Automaton:
+        """
+        Строит автомат Ахо-Корасик по всем словарям ключевых слов и смайликам.
+
+        Значение каждого ключа - пара (слово, категории), где категория -
+        "positive", "negative", "bad" или "emoticon". Один проход автомата по
+        тексту находит вхождения всех словарей и смайликов сразу.
+        """
+        categories: Dict[str, tuple] = {}
+        for category, words in (
+                ("positive", self.positive_tone_words),
+                ("negative", self.negative_tone_words),
+                ("bad", self.bad_words),
+                ("emoticon", LinguisticAnalyzer.EMOTICONS),
+        ):
+            for word in words:
+                categories[word] = categories.get(word, ()) + (category,)
+
+        automaton = ahocorasick.Automaton()
+        for word, word_categories in categories.items():
+            automaton.add_word(word, (word, word_categories))
+        automaton.make_automaton()
+        return automaton
+
+    def lexicon_hits(self, lowered: str) -> Dict[str, int]:
+        """
+        Считает, сколько различных слов каждой категории встречается в тексте,
+        и общее количество смайликов.
+
+        Результат можно один раз вычислить и передать в polarity_with_lexicon,
+        build_scenarios_single и LinguisticAnalyzer.extract_features.
+
+        Args:
+            lowered: Текст в нижнем регистре
+
+        Returns:
+            Словарь {"positive": n, "negative": n, "bad": n, "emoticon": n}
+        """
+        hits = {"positive": 0, "negative": 0, "bad": 0, "emoticon": 0}
+        found = set()
+        for _, value in self._lexicon.iter(lowered):
+            word_categories = value[1]
+            if "emoticon" in word_categories:
+                # Смайлики считаются по вхождениям (как re.findall), слова - по уникальности
+                hits["emoticon"] += 1
+            elif value not in found:
+                found.add(value)
+                for category in word_categories:
+                    hits[category] += 1
+        return hits
+
+    def _has_bad_words(self, lowered: str) -> bool:
+        """Проверяет, есть ли в тексте оскорбления."""
+        return any("bad" in word_categories for _, (_, word_categories) in self._lexicon.iter(lowered))
+
+    def support_scenario(
+            self,
+            emotion_label: str,
+            intensity: str,
+            text: str,
+            lowered: Optional[str] = None,
+            has_bad_words: Optional[bool] = None,
+    ) -> str:
         """
         Определяет рекомендацию для сценария поддержки клиентов.
 
@@ -114,17 +224,14 @@ class ScenarioEngine:
             emotion_label: Метка эмоции
             intensity: Интенсивность ("низкая", "средняя", "высокая")
             text: Исходный текст
+            lowered: Текст в нижнем регистре, если уже вычислен
+            has_bad_words: Есть ли в тексте оскорбления, если уже вычислено
 
         Returns:
             Строка с рекомендацией для оператора поддержки
         """
-        negative_emotions = {"anger", "sadness", "fear", "disgust", "annoyance",
-    "disappointment", "grief", "remorse", "nervousness",
-    "ANGER", "SADNESS", "FEAR", "DISGUST"}
-        positive_emotions = {"joy", "admiration", "JOY", "HAPPINESS", "gratitude", "love", "optimism"}
-
-        lowered = text.lower()
-        has_bad_words = any(bad in lowered for bad in self.bad_words)
+        if has_bad_words is None:
+            has_bad_words = self._has_bad_words(lowered if lowered is not None else text.lower())
 
         if has_bad_words:
             return (
@@ -132,18 +239,25 @@ class ScenarioEngine:
                 "Рекомендуется максимально вежливый ответ и при необходимости эскалация на старшего специалиста."
             )
 
-        if emotion_label in negative_emotions and intensity in {"средняя", "высокая"}:
+        if emotion_label in _NEGATIVE_EMOTIONS and intensity in _ELEVATED_INTENSITIES:
             return "Негативное обращение высокой важности: ответ с сочувствием, уточняющими вопросами и предложением решения."
 
-        if emotion_label in negative_emotions:
+        if emotion_label in _NEGATIVE_EMOTIONS:
             return "Негативное обращение: стоит ответить с сочувствием и предложить возможные варианты решения."
 
-        if emotion_label in positive_emotions:
+        if emotion_label in _POSITIVE_EMOTIONS:
             return "Положительное обращение: можно усилить позитивное впечатление и поблагодарить клиента."
 
 
 
-    def moderator_scenario(self, emotion_label: str, intensity: str, text: str) -> str:
+    def moderator_scenario(
+            self,
+            emotion_label: str,
+            intensity: str,
+            text: str,
+            lowered: Optional[str] = None,
+            has_bad_words: Optional[bool] = None,
+    ) -> str:
         """
         Определяет рекомендацию для сценария модерации чата.
 
@@ -151,20 +265,22 @@ class ScenarioEngine:
             emotion_label: Метка эмоции
             intensity: Интенсивность эмоции
             text: Исходный текст
+            lowered: Текст в нижнем регистре, если уже вычислен
+            has_bad_words: Есть ли в тексте оскорбления, если уже вычислено
 
         Returns:
             Строка с рекомендацией для модератора
         """
-        toxic_emotions = {"ANGER", "DISGUST", "IRRITATION", "ANGER/hostility", "anger"}
-        lowered = text.lower()
+        if has_bad_words is None:
+            has_bad_words = self._has_bad_words(lowered if lowered is not None else text.lower())
 
-        if any(bad in lowered for bad in self.bad_words):
+        if has_bad_words:
             return "Сообщение содержит оскорбления/ненормативную лексику: скрыть из чата и отправить модератору."
 
-        if emotion_label in toxic_emotions and intensity in {"средняя", "высокая"}:
+        if emotion_label in _TOXIC_EMOTIONS and intensity in _ELEVATED_INTENSITIES:
             return "Сообщение потенциально токсично: скрыть из чата и отправить на проверку модератору."
 
-        if emotion_label in toxic_emotions:
+        if emotion_label in _TOXIC_EMOTIONS:
             return "Сообщение может содержать негатив: отметить для выборочной проверки."
 
         return "Сообщение допустимо: оставить в чате."
@@ -190,56 +306,64 @@ class ScenarioEngine:
 
         return "Эмоциональный фон смешанный: нужны дополнительные исследования и сегментация отзывов."
 
-    def polarity_with_lexicon(self, label: str, text: str) -> Dict[str, int]:
+    def polarity_with_lexicon(
+            self,
+            label: str,
+            text: str,
+            lowered: Optional[str] = None,
+            hits: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, int]:
         """
         Вычисляет позитив/негатив используя метку эмоции и лексический анализ.
 
         Args:
             label: Метка эмоции из модели
             text: Исходный текст
+            lowered: Текст в нижнем регистре, если уже вычислен
+            hits: Результат lexicon_hits, если уже вычислен
 
         Returns:
             Словарь {"positive": %, "negative": %}
         """
-        lowered = text.lower()
-        pos_votes = 0
-        neg_votes = 0
-
-        if label in self.positive_labels:
-            pos_votes += 3
-        elif label in self.negative_labels:
-            neg_votes += 3
-
-        pos_hits = sum(1 for w in self.positive_tone_words if w in lowered)
-        neg_hits = sum(1 for w in self.negative_tone_words if w in lowered)
-
-        pos_votes += 2 * pos_hits
-        neg_votes += 1 * neg_hits
-
-        total_votes = pos_votes + neg_votes
-        if total_votes == 0:
-            return {"positive": 0, "negative": 0}
-
-        pos_share = int(round(pos_votes / total_votes * 100))
-        neg_share = 100 - pos_share
-        return {"positive": pos_share, "negative": neg_share}
-
-    def build_scenarios_single(self, emotion_label: str, intensity: str, text: str) -> Dict[str, str]:
+        if hits is None:
+            hits = self.lexicon_hits(lowered if lowered is not None else text.lower())
+
+        pos_votes, neg_votes = self._label_votes.get(label, (0, 0))
+        return _votes_to_shares(pos_votes + 2 * hits["positive"], neg_votes + hits["negative"])
+
+    def build_scenarios_single(
+            self,
+            emotion_label: str,
+            intensity: str,
+            text: str,
+            polarity: Optional[Dict[str, int]] = None,
+            hits: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, str]:
         """
         Собирает все три сценария для одного анализа.
 
+        Совпадения со словарями вычисляются один раз (если не переданы)
+        и передаются во все сценарии.
+
         Args:
             emotion_label: Метка эмоции
             intensity: Интенсивность
             text: Исходный текст
+            polarity: Результат polarity_with_lexicon, если уже вычислен
+            hits: Результат lexicon_hits, если уже вычислен
 
         Returns:
             Словарь с тремя сценариями: for_support, for_moderator, for_marketer
         """
-        for_support = self.support_scenario(emotion_label, intensity, text)
-        for_moderator = self.moderator_scenario(emotion_label, intensity, text)
+        if hits is None:
+            hits = self.lexicon_hits(text.lower())
+        has_bad_words = hits["bad"] > 0
+
+        for_support = self.support_scenario(emotion_label, intensity, text, has_bad_words=has_bad_words)
+        for_moderator = self.moderator_scenario(emotion_label, intensity, text, has_bad_words=has_bad_words)
         # Используем polarity_with_lexicon для маркетер-сценария
-        polarity = self.polarity_with_lexicon(emotion_label, text)
+        if polarity is None:
+            polarity = self.polarity_with_lexicon(emotion_label, text, hits=hits)
         for_marketer = self.marketer_scenario(polarity)
         return {
             "for_support": for_support,